@@ -0,0 +1,166 @@
+import argparse
+import multiprocessing as mp
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from embedding_server import APP_DIR, DEFAULT_SOCKET_PATH
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# ───────────────────────────────
+# 인프로세스(워커마다 모델 로딩) vs 공유 임베딩 서버 배치 비교
+#
+#   python bench_embedding_server.py --workers 4 --threads 4 --duration 20
+#
+# uvicorn 처럼 워커 프로세스 하나에 여러 요청이 동시에 들어오도록 워커마다 --threads 개의
+# 스레드가 요청을 보냅니다.
+# 각 워커는 실제 API 워커처럼 main.py 를 import 한 뒤 측정하므로 .env(OPENAI_API_KEY 등)가
+# 필요합니다. 같은 쿼리를 반복하므로 쿼리 임베딩 캐시는 끄고 잽니다.
+# 워커별 RSS(메모리)와 전체 처리량(요청/초)을 출력합니다. /proc 기반이라 Linux 전용입니다.
+
+QUERIES = [
+    ("잔잔하고 인생을 되돌아보게 하는 영화", ["따뜻한", "감동"]),
+    ("친구들이랑 웃으면서 볼 수 있는 영화", ["유쾌한"]),
+    ("밤에 혼자 보기 무서운 영화 추천해줘", ["무서운", "긴장감"]),
+    ("비 오는 날 보기 좋은 우울한 영화", ["우울한"]),
+    ("손에 땀을 쥐게 하는 모험 영화", ["모험", "긴장감 넘치는"]),
+]
+LOAD_TIMEOUT = 600  # 워커/서버 모델 로딩 최대 대기 (초)
+
+
+def rss_mb(pid: int | str = "self") -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(mode: str, socket_path: str, threads: int, start, duration: float, results):
+    if mode == "shared":
+        os.environ["EMBEDDING_SERVER_SOCKET"] = socket_path
+    else:
+        os.environ.pop("EMBEDDING_SERVER_SOCKET", None)
+    import main  # API 워커와 같은 import 집합을 올린 상태에서 측정
+
+    def run(message, tags):
+        main.retrieve_top_docs(main.embedding_model.embed_query(message), tags, 5)
+
+    run(*QUERIES[0])  # 워밍업
+    results.put(("ready",))
+    start.wait()
+
+    counts = [0] * threads
+    errors = []
+    deadline = time.time() + duration
+
+    def loop(i: int):
+        try:
+            while time.time() < deadline:
+                run(*QUERIES[(counts[i] + i) % len(QUERIES)])
+                counts[i] += 1
+        except Exception as e:
+            errors.append(e)
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    if errors:
+        raise errors[0]  # 비정상 종료로 collect 에서 드러나도록
+    results.put(("done", sum(counts), rss_mb()))
+
+
+def collect(results, procs, kind: str, timeout: float):
+    """워커 메시지를 len(procs)개 모읍니다. 워커가 죽거나 시간이 초과되면 예외를 냅니다."""
+    messages = []
+    deadline = time.time() + timeout
+    while len(messages) < len(procs):
+        try:
+            message = results.get(timeout=1)
+        except queue.Empty:
+            dead = [p.exitcode for p in procs if p.exitcode not in (None, 0)]
+            if dead:
+                raise RuntimeError(f"워커가 비정상 종료했습니다 (exitcode={dead})")
+            if time.time() > deadline:
+                raise RuntimeError(f"워커 응답 대기 시간 초과 ({kind})")
+            continue
+        if message[0] == kind:
+            messages.append(message)
+    return messages
+
+
+def wait_for_socket(proc, socket_path: str, timeout: float = LOAD_TIMEOUT):
+    deadline = time.time() + timeout
+    while not os.path.exists(socket_path):
+        if proc.poll() is not None or time.time() > deadline:
+            raise RuntimeError("임베딩 서버를 시작하지 못했습니다.")
+        time.sleep(0.5)
+
+
+def bench(mode: str, workers: int, threads: int, duration: float, socket_path: str):
+    server = None
+    procs = []
+    try:
+        if mode == "shared":
+            server = subprocess.Popen(
+                [sys.executable, os.path.join(APP_DIR, "embedding_server.py")],
+                cwd=APP_DIR,
+                env={**os.environ, "EMBEDDING_SERVER_SOCKET": socket_path},
+            )
+            wait_for_socket(server, socket_path)
+
+        start, results = mp.Event(), mp.Queue()
+        procs = [
+            mp.Process(target=worker, args=(mode, socket_path, threads, start, duration, results))
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        collect(results, procs, "ready", LOAD_TIMEOUT)
+
+        start.set()
+        stats = [(count, rss) for _, count, rss in collect(results, procs, "done", duration + 60)]
+        for p in procs:
+            p.join()
+        server_rss = rss_mb(server.pid) if server else 0.0
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+        if server:
+            server.terminate()
+            server.wait()
+
+    total = sum(count for count, _ in stats)
+    worker_rss = sum(rss for _, rss in stats) / len(stats)
+    return {
+        "throughput": total / duration,
+        "worker_rss": worker_rss,
+        "server_rss": server_rss,
+        "total_rss": worker_rss * workers + server_rss,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    args = parser.parse_args()
+
+    os.chdir(APP_DIR)  # main.py 가 상대 경로로 벡터DB/SQLite 를 연다
+    os.environ["EMBEDDING_CACHE_MAX_BYTES"] = "0"
+
+    print(f"📊 워커 {args.workers}개 × 스레드 {args.threads}개, {args.duration}초 측정\n")
+    print(f"{'모드':<10}{'요청/초':>10}{'워커 RSS(MB)':>16}{'서버 RSS(MB)':>16}{'전체 RSS(MB)':>16}")
+    for mode in ("inprocess", "shared"):
+        r = bench(mode, args.workers, args.threads, args.duration, args.socket)
+        print(f"{mode:<10}{r['throughput']:>10.1f}{r['worker_rss']:>16.1f}"
+              f"{r['server_rss']:>16.1f}{r['total_rss']:>16.1f}")
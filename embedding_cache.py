@@ -0,0 +1,190 @@
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+
+# ───────────────────────────────
+# 쿼리 텍스트 정규화 (띄어쓰기/구두점/대소문자 차이만 있는 요청은 같은 키로)
+# "무서운영화" 와 "무서운 영화" 처럼 띄어쓰기만 다른 경우도 맞도록 공백은 모두 제거합니다.
+# 조사만 다른 요청("무서운 영화를" / "무서운 영화")은 여기서 합치지 않고 2단계 캐시에 맡깁니다.
+_STRIP_RE = re.compile(r"\W")
+
+def normalize_query(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _STRIP_RE.sub("", text)
+
+
+# ───────────────────────────────
+# 두 단계 모두 같은 방식으로 메모리를 셉니다: sys.getsizeof 로 키/벡터/결과 객체 전체를
+# 재귀적으로 더하고, OrderedDict 항목(해시 슬롯 + 연결 노드)마다 고정 오버헤드를 더합니다.
+_ENTRY_OVERHEAD = 72  # CPython OrderedDict 항목당 실측 약 66바이트
+
+
+def sizeof(obj) -> int:
+    size = sys.getsizeof(obj)
+    if isinstance(obj, np.ndarray) and obj.base is not None:
+        size += obj.nbytes  # 뷰는 getsizeof 에 버퍼가 포함되지 않음
+    elif isinstance(obj, dict):
+        size += sum(sizeof(k) + sizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(sizeof(item) for item in obj)
+    return size
+
+
+# ───────────────────────────────
+# 1단계: 정규화된 텍스트 기준 정확 일치 LRU (바이트 예산 제한)
+class CachedEmbeddings:
+    """
+    HuggingFaceEmbeddings(또는 EmbeddingServerClient) 앞에 두는 embed_query 캐시.
+    embed_documents 등 나머지 메서드는 그대로 원본 모델에 위임합니다.
+    """
+
+    def __init__(self, embedding_model, max_bytes: int | None = None):
+        self.embedding_model = embedding_model
+        if max_bytes is None:
+            max_bytes = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> np.ndarray(float32)
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if name == "embedding_model":
+            raise AttributeError(name)
+        return getattr(self.embedding_model, name)
+
+    @staticmethod
+    def _entry_nbytes(key: str, vector: np.ndarray) -> int:
+        return _ENTRY_OVERHEAD + sizeof(key) + sizeof(vector)
+
+    def embed_query(self, text: str):
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return vector.tolist()
+            self._misses += 1
+
+        vector = np.asarray(self.embedding_model.embed_query(text), dtype=np.float32)
+        nbytes = self._entry_nbytes(key, vector)
+        if nbytes > self.max_bytes:
+            return vector.tolist()
+
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = vector
+                self._bytes += nbytes
+                while self._bytes > self.max_bytes:
+                    old_key, old_vector = self._entries.popitem(last=False)
+                    self._bytes -= self._entry_nbytes(old_key, old_vector)
+        return vector.tolist()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+            }
+
+
+# ───────────────────────────────
+# 2단계: 최근 쿼리 벡터 대상 최근접 이웃 → 유사도가 임계값 이상이면 검색 결과 통째로 재사용
+class QueryResultCache:
+    """
+    적중 시 태그까지 재사용하므로 반대 의미 쌍("무서운 영화" / "무섭지 않은 영화")이 합쳐지지 않는
+    threshold 를 확인한 뒤 켜야 합니다. 기본은 비활성(QUERY_CACHE_ENABLED=0)입니다.
+    """
+
+    def __init__(self, enabled: bool | None = None, threshold: float | None = None,
+                 max_entries: int | None = None, max_bytes: int | None = None):
+        if enabled is None:
+            enabled = os.getenv("QUERY_CACHE_ENABLED", "0").lower() in ("1", "true", "yes")
+        if threshold is None:
+            threshold = float(os.getenv("QUERY_CACHE_SIM_THRESHOLD", 0.95))
+        if max_entries is None:
+            max_entries = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 256))
+        if max_bytes is None:
+            max_bytes = int(os.getenv("QUERY_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+        self.enabled = enabled and max_entries > 0 and max_bytes > 0
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # id -> (정규화 벡터, 결과, 바이트)
+        self._next_id = 0
+        self._matrix = None  # lookup 용 (ids, 벡터 행렬), 변경 시 재생성
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector):
+        """가장 가까운 이전 쿼리와의 코사인 유사도가 threshold 이상이면 그 결과를, 아니면 None 을 반환합니다."""
+        if not self.enabled:
+            return None
+        query = self._unit(vector)
+        with self._lock:
+            if self._entries:
+                if self._matrix is None:
+                    ids = list(self._entries)
+                    self._matrix = (ids, np.stack([self._entries[i][0] for i in ids]))
+                ids, matrix = self._matrix
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id = ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self._hits += 1
+                    return self._entries[entry_id][1]
+            self._misses += 1
+            return None
+
+    def add(self, vector, result):
+        if not self.enabled:
+            return
+        unit = self._unit(vector)
+        nbytes = _ENTRY_OVERHEAD + sizeof(unit) + sizeof(result)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[self._next_id] = (unit, result, nbytes)
+            self._next_id += 1
+            self._bytes += nbytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, old_nbytes) = self._entries.popitem(last=False)
+                self._bytes -= old_nbytes
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "enabled": self.enabled,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+            }
@@ -0,0 +1,242 @@
+import os
+import secrets
+import socket
+import stat
+import sys
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from embedding_cache import CachedEmbeddings, QueryResultCache
+from retrieval import search_movies
+
+# ───────────────────────────────
+# 공유 임베딩/검색 서버
+#
+# uvicorn --workers N 으로 띄우면 워커마다 KoSBERT 와 Chroma 클라이언트가 따로 올라갑니다.
+# 이 프로세스 하나가 모델과 벡터 DB를 소유하고, API 워커들은 Unix 소켓으로
+# 인코딩/검색 요청만 보냅니다. 쿼리 임베딩 캐시와 유사 쿼리 결과 캐시도 이 프로세스에 두어
+# 워커 수와 상관없이 하나로 공유됩니다.
+#
+#   python embedding_server.py                       # 서버 실행 (기본 소켓 경로 출력)
+#   EMBEDDING_SERVER_SOCKET=<소켓 경로> uvicorn main:app --workers 4
+#
+# 연결은 authkey(HMAC 챌린지)로 서로 인증합니다. 키는 EMBEDDING_SERVER_AUTHKEY 환경변수,
+# 없으면 EMBEDDING_SERVER_AUTHKEY_FILE(기본: 앱 디렉터리의 .embedding_server_key, 0600)에서 읽고
+# 서버가 처음 뜰 때 파일이 없으면 새로 만듭니다.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# 누구나 쓸 수 있는 /tmp 대신 사용자 전용 디렉터리에 소켓을 둠
+DEFAULT_SOCKET_PATH = os.path.join(os.getenv("XDG_RUNTIME_DIR") or APP_DIR, "moviegpt_embedding.sock")
+AUTHKEY_FILE = os.getenv("EMBEDDING_SERVER_AUTHKEY_FILE", os.path.join(APP_DIR, ".embedding_server_key"))
+MODEL_NAME = "jhgan/ko-sbert-sts"
+PERSIST_DIR = "./movie_vectorDB"
+
+
+def load_authkey(create: bool = False) -> bytes:
+    key = os.getenv("EMBEDDING_SERVER_AUTHKEY")
+    if key:
+        return key.encode("utf-8")
+    if create and not os.path.exists(AUTHKEY_FILE):
+        fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    if not os.path.exists(AUTHKEY_FILE):
+        raise RuntimeError(f"임베딩 서버 인증 키가 없습니다: {AUTHKEY_FILE} (서버를 먼저 실행하세요)")
+    with open(AUTHKEY_FILE, encoding="utf-8") as f:
+        return f.read().strip().encode("utf-8")
+
+
+def _remove_stale_socket(path: str):
+    """이전 실행이 남긴 소켓만 지웁니다. 살아있는 소켓이나 남의 파일이면 시작을 거부합니다."""
+    if not os.path.lexists(path):
+        return
+    st = os.lstat(path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise RuntimeError(f"소켓 경로에 다른 파일이 있습니다: {path}")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        os.remove(path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f"이미 실행 중인 서버가 소켓을 사용하고 있습니다: {path}")
+
+
+# CPU 인코딩이 서로 경쟁하지 않도록 한 번에 하나씩 처리 (캐시 적중과 search 는 잠금 없이 처리)
+class _SerializedEmbeddings:
+    def __init__(self, embedding_model):
+        self.embedding_model = embedding_model
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str):
+        with self._lock:
+            return self.embedding_model.embed_query(text)
+
+    def embed_documents(self, texts: list[str]):
+        with self._lock:
+            return self.embedding_model.embed_documents(texts)
+
+
+class EmbeddingServer:
+    def __init__(self, socket_path: str, persist_dir: str = PERSIST_DIR):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        from langchain_community.vectorstores import Chroma
+
+        self.socket_path = socket_path
+        serialized_model = _SerializedEmbeddings(HuggingFaceEmbeddings(model_name=MODEL_NAME))
+        self.embedding_model = CachedEmbeddings(serialized_model)
+        self.query_result_cache = QueryResultCache()
+        self.vector_db = Chroma(
+            persist_directory=persist_dir,
+            embedding_function=serialized_model
+        )
+
+    def search(self, user_vector, user_tags: list[str], k: int = 5):
+        return search_movies(self.vector_db, user_vector, user_tags, k)
+
+    def _handle(self, conn):
+        ops = {
+            "embed_query": self.embedding_model.embed_query,
+            "embed_documents": self.embedding_model.embed_documents,
+            "search": self.search,
+            "lookup_result": self.query_result_cache.lookup,
+            "add_result": self.query_result_cache.add,
+            "embedding_stats": self.embedding_model.stats,
+            "query_result_stats": self.query_result_cache.stats,
+        }
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(("ok", ops[op](*args)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+    def serve_forever(self):
+        _remove_stale_socket(self.socket_path)
+        authkey = load_authkey(create=True)
+        old_umask = os.umask(0o177)  # bind 직후부터 소유자만 접근 가능하도록
+        try:
+            listener = Listener(self.socket_path, family="AF_UNIX", authkey=authkey)
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+        with listener:
+            print(f"🚀 임베딩 서버 대기 중: {self.socket_path}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, EOFError, OSError) as e:
+                    print("⚠️ 인증되지 않은 연결 거부:", e)
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+# ───────────────────────────────
+# API 워커용 클라이언트 (HuggingFaceEmbeddings 와 같은 embed_query / embed_documents 제공)
+class EmbeddingServerClient:
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        # FastAPI 동기 엔드포인트는 스레드풀에서 돌기 때문에 스레드마다 연결을 따로 둠
+        # (한 요청의 느린 search 가 같은 워커의 다른 요청을 막지 않도록)
+        self._local = threading.local()
+        self._conns = set()
+        self._conns_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.socket_path, family="AF_UNIX", authkey=load_authkey())
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.add(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            with self._conns_lock:
+                self._conns.discard(conn)
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _call(self, op: str, *args):
+        try:
+            self._connection().send((op, args))
+        except OSError:
+            # 서버 재시작 등으로 끊긴 연결: 요청이 온전히 전달되지 않았으므로 한 번만 다시 보냄
+            self._drop_connection()
+            self._connection().send((op, args))
+        try:
+            status, result = self._local.conn.recv()
+        except (EOFError, OSError):
+            # 요청이 이미 처리됐을 수 있으므로 재전송하지 않음
+            self._drop_connection()
+            raise
+        if status == "error":
+            raise RuntimeError(f"임베딩 서버 오류: {result}")
+        return result
+
+    def embed_query(self, text: str):
+        return self._call("embed_query", text)
+
+    def embed_documents(self, texts: list[str]):
+        return self._call("embed_documents", texts)
+
+    def search(self, user_vector, user_tags: list[str], k: int = 5):
+        return self._call("search", list(user_vector), user_tags, k)
+
+    def stats(self) -> dict:
+        return self._call("embedding_stats")
+
+    def close(self):
+        with self._conns_lock:
+            conns, self._conns = self._conns, set()
+        for conn in conns:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+
+# ───────────────────────────────
+# 서버에 있는 유사 쿼리 결과 캐시 (QueryResultCache 와 같은 lookup / add / stats 제공)
+class RemoteQueryResultCache:
+    def __init__(self, client: EmbeddingServerClient):
+        self.client = client
+        self._enabled = None
+
+    @property
+    def enabled(self) -> bool:
+        # 서버 설정은 실행 중에 바뀌지 않으므로 처음 한 번만 물어봄 (꺼져 있으면 왕복 생략)
+        if self._enabled is None:
+            self._enabled = self.stats()["enabled"]
+        return self._enabled
+
+    def lookup(self, vector):
+        if not self.enabled:
+            return None
+        return self.client._call("lookup_result", list(vector))
+
+    def add(self, vector, result):
+        if self.enabled:
+            self.client._call("add_result", list(vector), result)
+
+    def stats(self) -> dict:
+        return self.client._call("query_result_stats")
+
+
+# ───────────────────────────────
+if __name__ == "__main__":
+    sys.stdout.reconfigure(encoding='utf-8')
+    socket_path = os.getenv("EMBEDDING_SERVER_SOCKET", DEFAULT_SOCKET_PATH)
+    EmbeddingServer(socket_path).serve_forever()
@@ -9,10 +9,12 @@ from langchain_core.documents import Document
 from openai import OpenAI
 import os
 import json
-import numpy as np
 from models import RecommendationLog, WatchedMovie
 from schemas import RecommendationLogSchema, WatchedMovieCreate, WatchedMovieSchema,ReviewResponse,ReviewRequest,MovieDetailResponse
 from database import SessionLocal, engine, Base
+from retrieval import search_movies
+from embedding_server import EmbeddingServerClient, RemoteQueryResultCache
+from embedding_cache import CachedEmbeddings, QueryResultCache
 from sqlalchemy.orm import Session
 import time
 
@@ -40,11 +42,22 @@ def get_db():
         db.close()
 # ───────────────────────────────
 # 모델 및 DB 초기화
-embedding_model = HuggingFaceEmbeddings(model_name="jhgan/ko-sbert-sts")
-vector_db = Chroma(
-    persist_directory="./movie_vectorDB",
-    embedding_function=embedding_model
-)
+# EMBEDDING_SERVER_SOCKET 이 설정되면 모델/벡터DB는 embedding_server.py 프로세스가 소유하고
+# 이 워커는 소켓으로 인코딩/검색만 요청합니다. (uvicorn --workers N 배포용)
+# 쿼리 임베딩 캐시(정규화 텍스트 정확 일치 LRU)와 유사 쿼리 검색 결과 캐시도
+# 공유 서버 모드에서는 서버 한 곳에, 아니면 이 프로세스에 둡니다.
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET")
+if EMBEDDING_SERVER_SOCKET:
+    embedding_model = EmbeddingServerClient(EMBEDDING_SERVER_SOCKET)
+    query_result_cache = RemoteQueryResultCache(embedding_model)
+    vector_db = None
+else:
+    embedding_model = CachedEmbeddings(HuggingFaceEmbeddings(model_name="jhgan/ko-sbert-sts"))
+    query_result_cache = QueryResultCache()
+    vector_db = Chroma(
+        persist_directory="./movie_vectorDB",
+        embedding_function=embedding_model
+    )
 openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # ───────────────────────────────
@@ -67,60 +80,52 @@ def parse_gpt_json_response(raw_text: str):
         raw_text = raw_text[:-3]
     return json.loads(raw_text.strip())
 
+# ───────────────────────────────
+# 후보 영화 검색 (공유 서버 모드면 서버에 위임)
+def retrieve_top_docs(user_vector, user_tags, k: int = 5):
+    if vector_db is None:
+        return embedding_model.search(user_vector, user_tags, k)
+    return search_movies(vector_db, user_vector, user_tags, k)
+
 
 # ───────────────────────────────
 # API 엔드포인트
 @app.post("/recommend", response_model=RecommendResponse)
 def recommend(req: RecommendRequest,db:Session=Depends(get_db)):
     start=time.time()
-    # 1. GPT로 분위기 태그 추출
-    tag_prompt = f"""
-    다음 문장에서 감정, 분위기, 장르 관련 태그를 2~4개만 추출해줘.
-    "{req.message}"
-    형식: ["힐링", "감동", "우울한"]
-    """
-    tag_response = openai_client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "감정/분위기/장르 태그를 JSON 배열로 추출해줘. 코드블럭 없이."},
-            {"role": "user", "content": tag_prompt}
-        ]
-    )
-    user_tags = parse_gpt_json_response(tag_response.choices[0].message.content)
-    
-    print("🕒 GPT 태그 추출 소요:", time.time() - start); start = time.time()
+    user_vector = embedding_model.embed_query(req.message)
 
-    # 2. 벡터DB에서 mood_labels 기반 필터링
-    all_docs = vector_db.get(include=["documents", "metadatas"])
-    filtered = []
-    for doc_text, meta in zip(all_docs["documents"], all_docs["metadatas"]):
-        mood_tags = meta.get("mood_labels", "").split(", ")
-        if any(tag in mood_tags for tag in user_tags):
-            filtered.append((doc_text, meta))
+    # 0. 거의 같은 이전 요청이 있으면 태그/후보 검색 결과를 그대로 재사용
+    cached = query_result_cache.lookup(user_vector)
+    if cached is not None:
+        user_tags, top_docs = cached
+        print("🕒 유사 요청 캐시 적중:", time.time() - start); start = time.time()
+    else:
+        # 1. GPT로 분위기 태그 추출
+        tag_prompt = f"""
+        다음 문장에서 감정, 분위기, 장르 관련 태그를 2~4개만 추출해줘.
+        "{req.message}"
+        형식: ["힐링", "감동", "우울한"]
+        """
+        tag_response = openai_client.chat.completions.create(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": "감정/분위기/장르 태그를 JSON 배열로 추출해줘. 코드블럭 없이."},
+                {"role": "user", "content": tag_prompt}
+            ]
+        )
+        user_tags = parse_gpt_json_response(tag_response.choices[0].message.content)
 
-    if not filtered:
-        return {"reply": f"{user_tags} 분위기에 맞는 영화를 찾을 수 없었습니다."}
+        print("🕒 GPT 태그 추출 소요:", time.time() - start); start = time.time()
 
-    # 3. 필터링된 문서 → 벡터화하여 유사도 정렬
-    user_vector = embedding_model.embed_query(req.message)
-    movie_vectors = embedding_model.embed_documents([doc[0] for doc in filtered])
-    similarities = [np.dot(user_vector, mv) for mv in movie_vectors]
+        # 2~4. mood_labels 필터링 → 유사도 정렬 → 중복 제거하여 상위 5개만 추출
+        top_docs = retrieve_top_docs(user_vector, user_tags, k=5)
 
-    sorted_docs = sorted(zip(filtered, similarities), key=lambda x: x[1], reverse=True)
-    
-    
-    print("🕒 유사도 비교 소요:", time.time() - start); start = time.time()
-
-    # 4. 중복 제거하여 상위 5개만 추출
-    seen_titles = set()
-    top_docs = []
-    for ((doc_text, meta), _) in sorted_docs:
-        title = meta.get("title")
-        if title not in seen_titles:
-            seen_titles.add(title)
-            top_docs.append((doc_text, meta))
-        if len(top_docs) == 5:
-            break
+        if not top_docs:
+            return {"reply": f"{user_tags} 분위기에 맞는 영화를 찾을 수 없었습니다."}
+        query_result_cache.add(user_vector, (user_tags, top_docs))
+
+        print("🕒 유사도 비교 소요:", time.time() - start); start = time.time()
 
     # 5. GPT에게 추천 설명 요청
     titles = [f"{meta['title']} ({meta.get('year', '연도 미정')})" for _, meta in top_docs]
@@ -153,6 +158,18 @@ def recommend(req: RecommendRequest,db:Session=Depends(get_db)):
 
     return {"reply": gpt_response.choices[0].message.content,"log_id": log.id}
 
+# ───────────────────────────────
+# 임베딩/검색 캐시 상태 (튜닝용)
+# 공유 서버 모드면 서버의 전체 통계, 아니면 이 요청을 받은 워커(pid)만의 통계
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "pid": os.getpid(),
+        "shared": bool(EMBEDDING_SERVER_SOCKET),
+        "embedding": embedding_model.stats(),
+        "query_result": query_result_cache.stats(),
+    }
+
 # ───────────────────────────────
 # 추천 로그 목록 조회
 @app.get("/logs", response_model=list[RecommendationLogSchema])
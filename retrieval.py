@@ -0,0 +1,43 @@
+import numpy as np
+
+
+# ───────────────────────────────
+# mood_labels 기반 필터링 (벡터DB에 저장된 임베딩도 함께 가져옴)
+def filter_by_tags(vector_db, user_tags: list[str]):
+    all_docs = vector_db.get(include=["documents", "metadatas", "embeddings"])
+    filtered = []
+    for doc_text, meta, embedding in zip(all_docs["documents"], all_docs["metadatas"], all_docs["embeddings"]):
+        mood_tags = meta.get("mood_labels", "").split(", ")
+        if any(tag in mood_tags for tag in user_tags):
+            filtered.append((doc_text, meta, embedding))
+    return filtered
+
+
+# ───────────────────────────────
+# 필터링된 문서를 저장된 벡터로 유사도 정렬 후 중복 제거하여 상위 k개 추출
+def search_movies(vector_db, user_vector, user_tags: list[str], k: int = 5):
+    """
+    태그로 후보를 거른 뒤 user_vector 와의 유사도 순으로 상위 k개 (doc_text, meta)를 반환합니다.
+    태그에 맞는 후보가 없으면 빈 리스트를 반환합니다.
+
+    문서 벡터는 prepare_chroma_movie_db.py 가 같은 모델(jhgan/ko-sbert-sts)로 같은 page_content 를
+    임베딩해 저장해 둔 것을 쓰므로 요청마다 다시 인코딩하지 않습니다.
+    """
+    filtered = filter_by_tags(vector_db, user_tags)
+    if not filtered:
+        return []
+
+    movie_vectors = np.asarray([doc[2] for doc in filtered], dtype=np.float32)
+    similarities = movie_vectors @ np.asarray(user_vector, dtype=np.float32)
+
+    seen_titles = set()
+    top_docs = []
+    for i in np.argsort(-similarities, kind="stable"):
+        doc_text, meta, _ = filtered[i]
+        title = meta.get("title")
+        if title not in seen_titles:
+            seen_titles.add(title)
+            top_docs.append((doc_text, meta))
+        if len(top_docs) == k:
+            break
+    return top_docs